@@ -1,3 +1,5 @@
+from typing import Optional, Tuple
+
 import torch
 import torch.nn as nn
 
@@ -6,6 +8,10 @@ class CandlestickPredictor(nn.Module):
     """
     Exact model architecture from Colab notebook
     Encoder-Decoder LSTM for sequence-to-sequence candlestick prediction
+
+    The module is TorchScript-compatible: scripting it with torch.jit.script
+    compiles the autoregressive decoder loop, removing the per-step Python
+    dispatch overhead that dominates inference latency.
     """
     def __init__(self, input_size=4, output_size=4, hidden_size=128, num_layers=2):
         super().__init__()
@@ -13,49 +19,109 @@ class CandlestickPredictor(nn.Module):
         self.num_layers = num_layers
         self.output_size = output_size
 
-        # Encoder LSTM
-        self.encoder_lstm = nn.LSTM(input_size, hidden_size, num_layers, batch_first=True)
+        # Encoder LSTM (time-major: the optimized kernels want (seq, batch,
+        # feature) layout, so we transpose once at the module boundary instead
+        # of paying an internal transpose per call with batch_first=True)
+        self.encoder_lstm = nn.LSTM(input_size, hidden_size, num_layers)
 
         # Decoder LSTM - takes previous prediction (output_size) as input
-        self.decoder_lstm = nn.LSTM(output_size, hidden_size, num_layers, batch_first=True)
+        self.decoder_lstm = nn.LSTM(output_size, hidden_size, num_layers)
         # Linear layer to map decoder's hidden state to output_size features
         self.decoder_linear = nn.Linear(hidden_size, output_size)
 
-    def forward(self, x, past_lengths, future_lengths):
-        batch_size = x.size(0)
-
-        # Encoder
-        # Pack padded sequence
-        packed_input = nn.utils.rnn.pack_padded_sequence(x, past_lengths.cpu(), batch_first=True, enforce_sorted=False)
-
-        # Pass through encoder LSTM. We only need the final hidden and cell states.
-        _, (hidden_state, cell_state) = self.encoder_lstm(packed_input)
-
-        # Decoder
-        # Determine the maximum future_len in the current batch
-        max_future_len_in_batch = torch.max(future_lengths).item()
-
-        # Create an initial 'start token' input for the decoder (e.g., a tensor of zeros)
-        # This should have shape (batch_size, 1, self.output_size)
-        decoder_input = torch.zeros(batch_size, 1, self.output_size, device=x.device)
-
-        decoder_outputs = []
+        # Flat per-layer views of the decoder weights for the fused cell
+        # unroll in decode(). These alias the nn.LSTM parameters (which stay
+        # the registered/checkpointed ones), so training and loading are
+        # unaffected while decode() can run explicit gate math per step
+        # instead of a full nn.LSTM call with seq_len=1.
+        self._dec_w_ih = [getattr(self.decoder_lstm, 'weight_ih_l%d' % i) for i in range(num_layers)]
+        self._dec_w_hh = [getattr(self.decoder_lstm, 'weight_hh_l%d' % i) for i in range(num_layers)]
+        self._dec_b_ih = [getattr(self.decoder_lstm, 'bias_ih_l%d' % i) for i in range(num_layers)]
+        self._dec_b_hh = [getattr(self.decoder_lstm, 'bias_hh_l%d' % i) for i in range(num_layers)]
+
+    @torch.jit.export
+    def encode(self, x: torch.Tensor, past_lengths: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Run the encoder LSTM and return its final (hidden, cell) states
+
+        Accepts batch-first input (batch, seq, features) and transposes once
+        to time-major for the LSTM kernels.
+        """
+        x = x.transpose(0, 1).contiguous()
+
+        # With a single sequence (or uniform lengths) there is nothing to
+        # pack; skipping pack_padded_sequence avoids the past_lengths.cpu()
+        # host sync and an extra copy. The serving path is batch size 1.
+        if x.size(1) == 1 or bool(past_lengths.min() == past_lengths.max()):
+            _, (hidden_state, cell_state) = self.encoder_lstm(x)
+        else:
+            # Pack padded sequence
+            packed_input = nn.utils.rnn.pack_padded_sequence(x, past_lengths.cpu(), enforce_sorted=False)
+
+            # Pass through encoder LSTM. We only need the final hidden and cell states.
+            _, (hidden_state, cell_state) = self.encoder_lstm(packed_input)
+
+        return hidden_state, cell_state
+
+    @torch.jit.export
+    def decode(self, hidden_state: torch.Tensor, cell_state: torch.Tensor, future_lengths: torch.Tensor,
+               max_future_len: Optional[int] = None) -> torch.Tensor:
+        """Autoregressively decode future candles from encoder states
+
+        Unrolls the decoder as explicit LSTM cell math instead of calling
+        nn.LSTM with seq_len=1 per step, so the per-step work is a couple of
+        GEMMs plus pointwise ops the TorchScript fuser can collapse, rather
+        than a full cuDNN/MKL LSTM setup each timestep.
+
+        Pass max_future_len when the caller already knows it as a Python int;
+        deriving it from future_lengths costs a device-to-host sync.
+        """
+        batch_size = hidden_state.size(1)
+
+        # Determine the maximum future_len in the current batch (computed once)
+        if max_future_len is not None:
+            max_future_len_in_batch = max_future_len
+        else:
+            max_future_len_in_batch = int(torch.max(future_lengths).item())
+
+        # Per-layer hidden/cell states and combined gate biases, hoisted out
+        # of the time loop
+        h = list(hidden_state.unbind(0))
+        c = list(cell_state.unbind(0))
+        biases = [self._dec_b_ih[i] + self._dec_b_hh[i] for i in range(self.num_layers)]
+
+        # Initial 'start token' input for the decoder: (batch_size, output_size)
+        prediction = torch.zeros(batch_size, self.output_size, device=hidden_state.device)
+
+        # Preallocate the output buffer once instead of accumulating per-step
+        # tensors in a list and paying a torch.cat at the end
+        predictions = torch.empty(
+            max_future_len_in_batch, batch_size, self.output_size, device=hidden_state.device
+        )
 
         # Autoregressive decoding loop
-        for _ in range(max_future_len_in_batch):
-            # Pass through decoder LSTM
-            output, (hidden_state, cell_state) = self.decoder_lstm(decoder_input, (hidden_state, cell_state))
+        for t in range(max_future_len_in_batch):
+            # The detach (preventing backprop through past unrolling) is only
+            # needed in training; at inference it is a wasted dispatch.
+            layer_input = prediction.detach() if self.training else prediction
+
+            for i in range(self.num_layers):
+                gates = (torch.addmm(biases[i], layer_input, self._dec_w_ih[i].t())
+                         + torch.mm(h[i], self._dec_w_hh[i].t()))
+                in_gate, forget_gate, cell_gate, out_gate = gates.chunk(4, 1)
+                c[i] = torch.sigmoid(forget_gate) * c[i] + torch.sigmoid(in_gate) * torch.tanh(cell_gate)
+                h[i] = torch.sigmoid(out_gate) * torch.tanh(c[i])
+                layer_input = h[i]
 
             # Apply linear layer to get prediction for current timestep
-            prediction = self.decoder_linear(output)
+            prediction = self.decoder_linear(layer_input)
 
             # Store the prediction
-            decoder_outputs.append(prediction)
-
-            # Use the prediction as the input for the next timestep (detach to prevent backprop through past unrolling)
-            decoder_input = prediction.detach()
+            predictions[t] = prediction
 
-        # Concatenate the predictions along the sequence dimension
-        predictions = torch.cat(decoder_outputs, dim=1)
+        # Return batch-first for callers
+        return predictions.transpose(0, 1)
 
-        return predictions
+    def forward(self, x: torch.Tensor, past_lengths: torch.Tensor, future_lengths: torch.Tensor,
+                max_future_len: Optional[int] = None) -> torch.Tensor:
+        hidden_state, cell_state = self.encode(x, past_lengths)
+        return self.decode(hidden_state, cell_state, future_lengths, max_future_len)
@@ -0,0 +1,96 @@
+"""
+One-shot export of CandlestickPredictor to ONNX for serving with ONNX Runtime
+
+Usage:
+    python export_onnx.py [model_path] [output_path]
+
+The model is scripted first so the autoregressive decoder loop is exported
+as an ONNX Loop instead of being unrolled at a fixed future length.
+"""
+import inspect
+import os
+import sys
+
+import torch
+import torch.nn as nn
+
+from colab_model import CandlestickPredictor
+
+# Newer torch defaults to the torch.export-based ONNX exporter, which rejects
+# ScriptModules; older versions have no 'dynamo' argument at all
+_ONNX_EXPORT_KWARGS = (
+    {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+)
+
+
+class _ExportWrapper(nn.Module):
+    """
+    Export-friendly forward: drops the Optional max_future_len argument
+    (the TorchScript exporter cannot type-propagate a None placeholder) and
+    encodes without the pack_padded_sequence branch, whose device transfer
+    has no ONNX lowering. Serving is batch size 1, where packing is a no-op
+    anyway; the exported graph assumes sequences are used at full length.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x, past_lengths, future_lengths):
+        x = x.transpose(0, 1)
+        _, (hidden_state, cell_state) = self.model.encoder_lstm(x)
+
+        # Plain nn.LSTM decode loop: decode()'s fused cell math keeps its
+        # per-layer state in tensor lists, which the ONNX Loop lowering
+        # cannot carry between iterations. ORT fuses the LSTM/Gemm chain on
+        # its side, so nothing is lost relative to the in-process fast path.
+        batch_size = hidden_state.size(1)
+        prediction = torch.zeros(batch_size, self.model.output_size,
+                                 device=hidden_state.device)
+        predictions: list[torch.Tensor] = []
+        max_future_len = int(torch.max(future_lengths).item())
+        for t in range(max_future_len):
+            output, (hidden_state, cell_state) = self.model.decoder_lstm(
+                prediction.unsqueeze(0), (hidden_state, cell_state))
+            prediction = self.model.decoder_linear(output.squeeze(0))
+            predictions.append(prediction)
+        return torch.stack(predictions, dim=1)
+
+
+def export_model(model_path="../candlestick_predictor_model.pth", output_path="cpm.onnx"):
+    model = CandlestickPredictor(input_size=4, output_size=4, hidden_size=128, num_layers=2)
+
+    if os.path.exists(model_path):
+        state_dict = torch.load(model_path, map_location="cpu")
+        model.load_state_dict(state_dict, strict=False)
+        print(f"Loaded weights from {model_path}")
+    else:
+        print(f"⚠️  Model file not found at {model_path}, exporting untrained weights")
+
+    model.eval()
+    scripted = torch.jit.script(_ExportWrapper(model).eval())
+
+    dummy_x = torch.rand(1, 20, 4)
+    dummy_past = torch.tensor([20], dtype=torch.long)
+    dummy_future = torch.tensor([10], dtype=torch.long)
+
+    torch.onnx.export(
+        scripted,
+        (dummy_x, dummy_past, dummy_future),
+        output_path,
+        opset_version=17,
+        input_names=["x", "past_lengths", "future_lengths"],
+        output_names=["predictions"],
+        dynamic_axes={
+            "x": {0: "batch", 1: "seq_len"},
+            "past_lengths": {0: "batch"},
+            "future_lengths": {0: "batch"},
+            "predictions": {0: "batch", 1: "future_len"},
+        },
+        **_ONNX_EXPORT_KWARGS,
+    )
+    print(f"✅ Exported ONNX model to {output_path}")
+
+
+if __name__ == "__main__":
+    export_model(*sys.argv[1:3])
@@ -1,17 +1,32 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, UploadFile, File
 from pydantic import BaseModel
 import uvicorn
 import torch
 import torch.nn as nn
 import numpy as np
+import cv2
+import asyncio
 import logging
 from typing import List
 import os
 
 from model import CandlestickLSTM
 from inference import ModelInference
+from image_to_numeric import image_to_numeric
 
 
+# CPU threading knobs: container defaults oversubscribe cores, which makes
+# the small batch=1 LSTM kernels thrash. These must be set before the first
+# tensor op, hence at import time rather than in startup_event.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+torch.set_num_threads(int(os.environ.get("TORCH_NUM_THREADS", max(1, (os.cpu_count() or 2) // 2))))
+try:
+    torch.set_num_interop_threads(1)
+except RuntimeError:
+    pass  # interop pool already started (e.g. module re-imported)
+torch.backends.mkldnn.enabled = True
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,6 +36,41 @@ app = FastAPI(title="Candlestick Predictor AI Service", version="1.0.0")
 # Global model instance
 model_inference = None
 
+# Micro-batching: requests queue their sequences and a background worker
+# groups up to MAX_BATCH of them (waiting at most BATCH_WAIT for stragglers)
+# into one batched forward, so concurrent traffic stops running at batch=1
+MAX_BATCH = 16
+BATCH_WAIT = 0.005  # seconds
+predict_queue = asyncio.Queue()
+batch_task = None
+
+
+async def batch_worker():
+    while True:
+        items = [await predict_queue.get()]
+        while len(items) < MAX_BATCH:
+            try:
+                items.append(await asyncio.wait_for(predict_queue.get(), timeout=BATCH_WAIT))
+            except asyncio.TimeoutError:
+                break
+
+        sequences = [sequence for sequence, _ in items]
+        try:
+            if model_inference is None:
+                raise RuntimeError("Model not loaded")
+            if len(items) == 1:
+                results = [model_inference.predict(sequences[0])]
+            else:
+                results = model_inference.predict_batch(sequences)
+            for (_, fut), result in zip(items, results):
+                if not fut.done():
+                    fut.set_result(result)
+        except Exception as batch_error:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(batch_error)
+
+
 class PredictionRequest(BaseModel):
     sequence: List[List[float]]
 
@@ -30,7 +80,8 @@ class PredictionResponse(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Initialize the model on startup"""
-    global model_inference
+    global model_inference, batch_task
+    batch_task = asyncio.create_task(batch_worker())
     try:
         model_path = "/app/models/candlestick_predictor_model.pth"
         
@@ -61,6 +112,12 @@ async def startup_event():
             logger.error(f"Failed to create fallback model: {str(fallback_error)}")
             model_inference = None
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the micro-batching worker so the event loop can drain cleanly"""
+    if batch_task is not None:
+        batch_task.cancel()
+
 @app.get("/")
 async def root():
     return {"message": "Candlestick Predictor AI Service", "status": "running"}
@@ -115,10 +172,12 @@ async def predict(request: PredictionRequest):
             raise HTTPException(status_code=400, detail="Each candlestick must have 4 values (OHLC)")
         
         logger.info(f"Received prediction request with {len(sequence)} candlesticks")
-        
-        # Get prediction from model
-        prediction = model_inference.predict(sequence)
-        
+
+        # Hand the sequence to the micro-batching worker and await its result
+        future = asyncio.get_running_loop().create_future()
+        await predict_queue.put((sequence, future))
+        prediction = await future
+
         logger.info(f"Generated prediction with {len(prediction)} future candlesticks")
         
         return {"prediction": prediction}
@@ -129,6 +188,99 @@ async def predict(request: PredictionRequest):
         logger.error(f"Error during prediction: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+@app.post("/predict-binary")
+async def predict_binary(request: Request):
+    """
+    Binary variant of /predict: raw little-endian float32 OHLC rows in, raw
+    float32 rows out (shape echoed in the X-Shape header)
+
+    Skips JSON encode/parse on both sides, which dominates CPU cost for
+    these small payloads, and halves bytes on the wire. /predict stays as
+    the compatible JSON interface.
+    """
+    try:
+        if model_inference is None:
+            raise HTTPException(status_code=503, detail="Model not loaded")
+
+        body = await request.body()
+        if not body or len(body) % 16 != 0:
+            raise HTTPException(status_code=400,
+                                detail="Body must be float32 [open, high, low, close] rows")
+
+        # tolist keeps the downstream (and its fallback paths) on the same
+        # list-of-rows type as the JSON endpoint; at ~50 rows it is microseconds
+        sequence = np.frombuffer(body, dtype='<f4').reshape(-1, 4).tolist()
+
+        logger.info(f"Received binary prediction request with {len(sequence)} candlesticks")
+
+        # Same micro-batching path as the JSON endpoint
+        future = asyncio.get_running_loop().create_future()
+        await predict_queue.put((sequence, future))
+        prediction = await future
+
+        out = np.asarray(prediction, dtype='<f4')
+        return Response(
+            content=out.tobytes(),
+            media_type="application/octet-stream",
+            headers={"X-Shape": f"{out.shape[0]},4"},
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during binary prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+@app.post("/predict-from-image")
+async def predict_from_image(file: UploadFile = File(...)):
+    """
+    One-RPC variant of the full pipeline: raw chart image in, predicted
+    future candlesticks out as packed little-endian float32 rows
+
+    Extraction and inference share the same in-process ndarray, so the
+    backend's /full-process skips one JSON serialize/parse pair and one
+    network round-trip compared to convert-then-/predict.
+    """
+    try:
+        if model_inference is None:
+            raise HTTPException(status_code=503, detail="Model not loaded")
+
+        contents = await file.read()
+
+        # Decode and extract off the event loop; both are CPU-bound
+        def _extract(buf: bytes):
+            img = cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                return None
+            return image_to_numeric(img)
+
+        sequence = await asyncio.to_thread(_extract, contents)
+
+        if sequence is None:
+            raise HTTPException(status_code=400, detail="Invalid image format")
+        if not sequence:
+            raise HTTPException(status_code=400, detail="No candlesticks detected in image")
+
+        logger.info(f"Extracted {len(sequence)} candlesticks from uploaded image")
+
+        # Same micro-batching path as the numeric endpoints
+        future = asyncio.get_running_loop().create_future()
+        await predict_queue.put((sequence, future))
+        prediction = await future
+
+        out = np.asarray(prediction, dtype='<f4')
+        return Response(
+            content=out.tobytes(),
+            media_type="application/octet-stream",
+            headers={"X-Shape": f"{out.shape[0]},4"},
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during image prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
 @app.post("/predict-demo")
 async def predict_demo(request: PredictionRequest):
     """
@@ -173,43 +325,40 @@ def generate_demo_prediction(sequence: List[List[float]], prediction_length: int
     avg_change = np.mean(price_changes) if price_changes else 0
     volatility = np.std(price_changes) if price_changes else 0.02
     
-    # Start from last candle's close
+    # Start from last candle's close and generate all candles in one shot:
+    # one RNG draw plus vectorized OHLC math instead of per-candle sampling
     last_close = sequence[-1][3]
-    prediction = []
-    
-    for i in range(prediction_length):
-        # Add some randomness to the trend
-        noise = np.random.normal(0, volatility)
-        trend_factor = avg_change + noise
-        
-        # Calculate new close price
-        new_close = last_close * (1 + trend_factor)
-        
-        # Generate realistic OHLC
-        # Open near previous close with small gap
-        new_open = last_close * (1 + np.random.normal(0, 0.001))
-        
-        # High and low based on volatility
-        price_range = abs(new_close - new_open) + (volatility * last_close)
-        new_high = max(new_open, new_close) + np.random.uniform(0, price_range)
-        new_low = min(new_open, new_close) - np.random.uniform(0, price_range)
-        
-        # Ensure proper OHLC relationships
-        new_high = max(new_high, new_open, new_close)
-        new_low = min(new_low, new_open, new_close)
-        
-        # Normalize to 0-1 range (assuming input was normalized)
-        new_candle = [
-            max(0, min(1, new_open)),
-            max(0, min(1, new_high)),
-            max(0, min(1, new_low)),
-            max(0, min(1, new_close))
-        ]
-        
-        prediction.append(new_candle)
-        last_close = new_close
-    
-    return prediction
+    rng = np.random.default_rng()
+    z = rng.standard_normal((prediction_length, 2))
+    u = rng.random((prediction_length, 2))
+
+    # Close prices follow the trend with noise, compounding step to step
+    trend_factors = avg_change + volatility * z[:, 0]
+    closes = last_close * np.cumprod(1 + trend_factors)
+
+    # Open near previous close with small gap
+    prev_closes = np.concatenate([[last_close], closes[:-1]])
+    opens = prev_closes * (1 + 0.001 * z[:, 1])
+
+    # High and low based on volatility
+    price_range = np.abs(closes - opens) + (volatility * prev_closes)
+    highs = np.maximum(opens, closes) + u[:, 0] * price_range
+    lows = np.minimum(opens, closes) - u[:, 1] * price_range
+
+    # Ensure proper OHLC relationships and normalize to 0-1 range
+    candles = np.stack([opens, highs, lows, closes], axis=1)
+    candles[:, 1] = np.maximum(candles[:, 1], np.maximum(candles[:, 0], candles[:, 3]))
+    candles[:, 2] = np.minimum(candles[:, 2], np.minimum(candles[:, 0], candles[:, 3]))
+    np.clip(candles, 0.0, 1.0, out=candles)
+
+    return candles.tolist()
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8001, reload=True)
+    if os.getenv("DEV"):
+        # Hot reload for local development
+        uvicorn.run("main:app", host="0.0.0.0", port=8001, reload=True)
+    else:
+        # Single worker on purpose: each extra worker would load its own
+        # model copy and fight the torch thread pinning above
+        uvicorn.run("main:app", host="0.0.0.0", port=8001,
+                    loop="uvloop", http="httptools")
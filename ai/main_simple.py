@@ -1,7 +1,10 @@
 from fastapi import FastAPI
 import uvicorn
 from pydantic import BaseModel
+import asyncio
+import hashlib
 import json
+from collections import OrderedDict
 from typing import List
 import torch
 import numpy as np
@@ -14,19 +17,360 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from colab_model import CandlestickPredictor
 
+# CPU threading knobs: container defaults oversubscribe cores, which makes
+# the small batch=1 LSTM kernels thrash. These must be set before the first
+# tensor op, hence at import time rather than in startup_event.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+torch.set_num_threads(int(os.environ.get("TORCH_NUM_THREADS", max(1, (os.cpu_count() or 2) // 2))))
+try:
+    torch.set_num_interop_threads(1)
+except RuntimeError:
+    pass  # interop pool already started (e.g. module re-imported)
+torch.backends.mkldnn.enabled = True
+
 app = FastAPI(title="Candlestick AI Service - Real Model", version="1.0.0")
 
 # Global model
 model = None
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
-@app.on_event("startup") 
+# Optional ONNX Runtime session (see export_onnx.py); bypasses Python/autograd
+# dispatch entirely when a cpm.onnx artifact is present
+ONNX_MODEL_PATH = os.environ.get("ONNX_MODEL_PATH", "cpm.onnx")
+ort_session = None
+
+# Persisted TorchScript artifact; loading it on later starts skips the
+# (expensive, non-deterministic) JIT compile pass
+TS_MODEL_PATH = os.environ.get("TS_MODEL_PATH", "cpm.ts")
+
+# Source weights the artifacts above are derived from
+WEIGHTS_PATH = "../candlestick_predictor_model.pth"
+
+
+def load_onnx_session():
+    """Load the exported ONNX model if present; return None to use PyTorch"""
+    if not os.path.exists(ONNX_MODEL_PATH):
+        return None
+    try:
+        import onnxruntime as ort
+        session = ort.InferenceSession(
+            ONNX_MODEL_PATH,
+            providers=['CUDAExecutionProvider', 'CPUExecutionProvider'])
+        print(f"✅ Serving with ONNX Runtime from {ONNX_MODEL_PATH}")
+        return session
+    except Exception as ort_error:
+        print(f"⚠️  Could not load ONNX model, using PyTorch: {ort_error}")
+        return None
+
+
+def run_onnx(batch, lengths, future_lens):
+    """Run a padded (B, T, 4) numpy batch through the ONNX Runtime session"""
+    feeds = {
+        "x": batch,
+        "past_lengths": np.asarray(lengths, dtype=np.int64),
+        "future_lengths": np.asarray(future_lens, dtype=np.int64),
+    }
+    # The exporter prunes inputs the graph does not consume (past_lengths is
+    # only meaningful for padded multi-sequence batches), so feed by name
+    session_inputs = {i.name for i in ort_session.get_inputs()}
+    out = ort_session.run(None, {k: v for k, v in feeds.items() if k in session_inputs})[0]
+    return [out[i, :future_lens[i]].tolist() for i in range(len(lengths))]
+
+# Reusable host-side input buffer: filling a preallocated (pinned on CUDA)
+# buffer via numpy avoids torch.tensor's elementwise parse of nested lists
+# and enables an overlapped H2D copy
+MAX_SEQ_LEN = 512
+_input_buf = torch.empty((1, MAX_SEQ_LEN, 4), dtype=torch.float32,
+                         pin_memory=(device.type == 'cuda'))
+
+
+def sequence_to_tensor(sequence):
+    """Convert an OHLC list into a (1, seq_len, 4) tensor on the model device"""
+    arr = np.asarray(sequence, dtype=np.float32)
+    n = arr.shape[0]
+    if n > MAX_SEQ_LEN:
+        # Rare oversized input: fall back to a direct copy
+        return torch.from_numpy(arr).unsqueeze(0).to(device)
+    _input_buf[0, :n].copy_(torch.from_numpy(arr))
+    return _input_buf[:, :n].to(device, non_blocking=True)
+
+
+# LRU cache of encoder (hidden, cell) states keyed by input bytes, so repeated
+# sliding-window requests with the same prefix skip the encoder entirely
+ENCODER_CACHE_SIZE = 128
+encoder_cache = OrderedDict()
+
+
+def cached_encode(input_tensor, past_lengths):
+    """Encode the input sequence, reusing cached encoder states on repeat inputs"""
+    key = hashlib.blake2b(input_tensor.cpu().numpy().tobytes(), digest_size=16).digest()
+    cached = encoder_cache.get(key)
+    if cached is not None:
+        encoder_cache.move_to_end(key)
+        return cached
+    hidden_state, cell_state = model.encode(input_tensor, past_lengths)
+    encoder_cache[key] = (hidden_state, cell_state)
+    if len(encoder_cache) > ENCODER_CACHE_SIZE:
+        encoder_cache.popitem(last=False)
+    return hidden_state, cell_state
+
+
+def maybe_quantize(model):
+    """
+    Apply dynamic int8 quantization when QUANTIZE_INT8=1 (CPU serving).
+
+    Stores LSTM/Linear weights as int8 and quantizes activations per op,
+    roughly halving weight bandwidth. No retraining needed; the fp32 model
+    is kept when the flag is unset or quantization fails. Note the fused
+    decoder unroll keeps its fp32 weight views, so the int8 win applies to
+    the encoder LSTM and the decoder projection.
+    """
+    if os.environ.get("QUANTIZE_INT8") != "1":
+        return model
+    try:
+        import torch.nn as nn
+        quantized = torch.ao.quantization.quantize_dynamic(
+            model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+        print("✅ Applied dynamic int8 quantization")
+        return quantized
+    except Exception as quant_error:
+        print(f"⚠️  Quantization failed, keeping fp32 weights: {quant_error}")
+        return model
+
+
+def warmup_model(model):
+    """Run a few representative inputs so compilation cost is paid at startup"""
+    with torch.no_grad():
+        for seq_len, future_len in [(10, 5), (20, 10), (50, 16)]:
+            dummy = torch.rand(1, seq_len, 4, device=device)
+            dummy_past = torch.tensor([seq_len], dtype=torch.long, device=device)
+            dummy_future = torch.tensor([future_len], dtype=torch.long, device=device)
+            model(dummy, dummy_past, dummy_future)
+
+
+def compile_model(model):
+    """
+    Compile the model and warm it up once so the JIT compilation cost is
+    paid at startup instead of on the first request.
+
+    Uses torch.compile (Inductor, fused kernels) when TORCH_COMPILE=1 and
+    available; defaults to TorchScript otherwise. The scripted artifact is
+    persisted to TS_MODEL_PATH so later container starts skip the JIT
+    compile phase entirely and just load it.
+    """
+    if os.environ.get("TORCH_COMPILE") == "1" and hasattr(torch, "compile"):
+        try:
+            # dynamic=True avoids recompilation per past/future length
+            compiled = torch.compile(model, mode="reduce-overhead", dynamic=True)
+            warmup_model(compiled)
+            print("✅ Model compiled with torch.compile (reduce-overhead) and warmed up")
+            return compiled
+        except Exception as compile_error:
+            print(f"⚠️  torch.compile failed, falling back to TorchScript: {compile_error}")
+
+    # Reuse a previously compiled artifact if one exists and is not stale:
+    # retrained weights (a newer .pth) must invalidate it, or the service
+    # would silently keep serving the old model
+    ts_is_current = os.path.exists(TS_MODEL_PATH)
+    if ts_is_current and os.path.exists(WEIGHTS_PATH) \
+            and os.path.getmtime(WEIGHTS_PATH) > os.path.getmtime(TS_MODEL_PATH):
+        print(f"⚠️  {WEIGHTS_PATH} is newer than {TS_MODEL_PATH}, re-scripting")
+        ts_is_current = False
+    if ts_is_current:
+        try:
+            loaded = torch.jit.load(TS_MODEL_PATH, map_location=device)
+            loaded.eval()
+            warmup_model(loaded)
+            print(f"✅ Loaded precompiled TorchScript model from {TS_MODEL_PATH}")
+            return loaded
+        except Exception as load_error:
+            print(f"⚠️  Could not load {TS_MODEL_PATH}, re-scripting: {load_error}")
+
+    try:
+        scripted = torch.jit.script(model)
+        scripted.eval()
+        try:
+            # Freezing inlines parameters as constants (enabling constant
+            # folding) and optimize_for_inference strips training-only
+            # branches and applies the remaining fusion passes
+            frozen = torch.jit.freeze(scripted, preserved_attrs=["encode", "decode"])
+            scripted = torch.jit.optimize_for_inference(frozen, other_methods=["encode", "decode"])
+            print("✅ Model frozen and optimized for inference")
+        except Exception as freeze_error:
+            print(f"⚠️  freeze/optimize_for_inference failed, keeping plain script: {freeze_error}")
+        try:
+            torch.jit.save(scripted, TS_MODEL_PATH)
+            print(f"✅ Saved TorchScript artifact to {TS_MODEL_PATH}")
+        except Exception as save_error:
+            print(f"⚠️  Could not save TorchScript artifact: {save_error}")
+        warmup_model(scripted)
+        print("✅ Model scripted with TorchScript and warmed up")
+        return scripted
+    except Exception as script_error:
+        print(f"⚠️  TorchScript compilation failed, using eager model: {script_error}")
+        return model
+
+
+def bf16_supported():
+    """Whether the serving hardware has fast bfloat16 paths"""
+    if device.type == 'cuda':
+        return torch.cuda.is_bf16_supported()
+    try:
+        return torch.cpu._is_avx512_bf16_supported()
+    except AttributeError:
+        return False
+
+
+# Optional bf16 autocast (BF16_AUTOCAST=1): halves weight bandwidth and
+# doubles ALU throughput on the decoder GEMMs where supported. Outputs are
+# cast back to fp32 before validation/serialization.
+BF16_AUTOCAST = os.environ.get("BF16_AUTOCAST") == "1" and bf16_supported()
+
+
+def compute_future_len(input_len):
+    """
+    Calculate future length based on training data ratios (model expects this)
+    The model was trained with variable lengths, so we predict a realistic length
+    """
+    if input_len <= 10:
+        return max(5, input_len // 2)  # At least 5, up to half input length
+    elif input_len <= 25:
+        return input_len // 2  # About half the input length
+    else:
+        return min(25, input_len // 3)  # Reasonable cap at 25 candles
+
+
+# CUDA Graphs (CUDA_GRAPHS=1, GPU only): capture the forward once per
+# (past_len, future_len) shape and replay it per request, collapsing the many
+# tiny decoder kernel launches into a single graph launch
+CUDA_GRAPHS = os.environ.get("CUDA_GRAPHS") == "1" and torch.cuda.is_available()
+cuda_graph_cache = {}
+
+
+def run_cuda_graph(input_tensor, past_lengths, future_len):
+    """Replay a captured CUDA graph for this shape, capturing it on first use"""
+    key = (input_tensor.size(1), future_len)
+    entry = cuda_graph_cache.get(key)
+    if entry is None:
+        static_x = input_tensor.clone()
+        static_past = past_lengths.clone()
+        future_lengths = torch.tensor([future_len], dtype=torch.long, device=device)
+
+        # Warm up on a side stream before capture
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(3):
+                model(static_x, static_past, future_lengths, future_len)
+        torch.cuda.current_stream().wait_stream(stream)
+
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            static_out = model(static_x, static_past, future_lengths, future_len)
+        entry = (graph, static_x, static_out)
+        cuda_graph_cache[key] = entry
+
+    graph, static_x, static_out = entry
+    static_x.copy_(input_tensor)
+    graph.replay()
+    return static_out.clone()
+
+
+def run_single(sequence):
+    """Run one sequence through the model, reusing cached encoder states"""
+    if ort_session is not None:
+        arr = np.asarray(sequence, dtype=np.float32)[None]
+        return run_onnx(arr, [len(sequence)], [compute_future_len(len(sequence))])[0]
+
+    input_tensor = sequence_to_tensor(sequence)  # Shape: (1, seq_len, 4)
+    past_lengths = torch.tensor([len(sequence)], dtype=torch.long).to(device)
+    future_len = compute_future_len(len(sequence))
+
+    # inference_mode is cheaper than no_grad: no version counter/view tracking
+    with torch.inference_mode(), \
+            torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=BF16_AUTOCAST):
+        if CUDA_GRAPHS:
+            prediction = run_cuda_graph(input_tensor, past_lengths, future_len)
+        else:
+            future_lengths = torch.tensor([future_len], dtype=torch.long).to(device)
+            hidden_state, cell_state = cached_encode(input_tensor, past_lengths)
+            # Passing future_len as a Python int avoids a device->host sync
+            prediction = model.decode(hidden_state, cell_state, future_lengths, future_len)
+        # prediction shape: (1, max_future_len, 4); cast back to fp32 for numpy
+        return prediction.squeeze(0)[:future_len].float().cpu().numpy().tolist()
+
+
+def run_batch(sequences):
+    """Run several sequences as a single padded, batched forward pass"""
+    lengths = [len(seq) for seq in sequences]
+    max_len = max(lengths)
+    batch = np.zeros((len(sequences), max_len, 4), dtype=np.float32)
+    for i, seq in enumerate(sequences):
+        batch[i, :lengths[i]] = seq
+
+    if ort_session is not None:
+        return run_onnx(batch, lengths, [compute_future_len(n) for n in lengths])
+
+    input_tensor = torch.from_numpy(batch).to(device)
+    past_lengths = torch.tensor(lengths, dtype=torch.long).to(device)
+    future_lens = [compute_future_len(n) for n in lengths]
+    future_lengths = torch.tensor(future_lens, dtype=torch.long).to(device)
+
+    with torch.inference_mode(), \
+            torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=BF16_AUTOCAST):
+        predictions = model(input_tensor, past_lengths, future_lengths, max(future_lens))
+        out = predictions.float().cpu().numpy()
+
+    return [out[i, :future_lens[i]].tolist() for i in range(len(sequences))]
+
+
+# Micro-batching: requests queue their sequences and a background worker
+# groups up to MAX_BATCH of them (waiting at most BATCH_WAIT for stragglers)
+# into one batched forward, so concurrent traffic stops running at batch=1
+MAX_BATCH = 16
+BATCH_WAIT = 0.005  # seconds
+predict_queue = asyncio.Queue()
+batch_task = None
+
+
+async def batch_worker():
+    while True:
+        items = [await predict_queue.get()]
+        while len(items) < MAX_BATCH:
+            try:
+                items.append(await asyncio.wait_for(predict_queue.get(), timeout=BATCH_WAIT))
+            except asyncio.TimeoutError:
+                break
+
+        sequences = [sequence for sequence, _ in items]
+        try:
+            if len(items) == 1:
+                results = [run_single(sequences[0])]
+            else:
+                results = run_batch(sequences)
+            for (_, fut), result in zip(items, results):
+                if not fut.done():
+                    fut.set_result(result)
+        except Exception as batch_error:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(batch_error)
+
+
+@app.on_event("startup")
 async def startup_event():
     """Load the actual model on startup"""
-    global model
+    global model, ort_session, batch_task
+    encoder_cache.clear()  # Cached states and graphs are invalid across reloads
+    cuda_graph_cache.clear()
+    # Keep a strong reference: the loop only holds tasks weakly, and a
+    # collected worker would leave every queued future pending forever
+    batch_task = asyncio.create_task(batch_worker())
+    ort_session = load_onnx_session()
     try:
         # Try to load the pre-trained model
-        model_path = "../candlestick_predictor_model.pth"
+        model_path = WEIGHTS_PATH
         if os.path.exists(model_path):
             print(f"Loading model from {model_path}")
             # Use parameters that match the saved model
@@ -50,6 +394,8 @@ async def startup_event():
             
             model.to(device)
             model.eval()
+            model = maybe_quantize(model)
+            model = compile_model(model)
             print("✅ Model ready for inference!")
         else:
             print("⚠️  Model file not found, creating new model for demo")
@@ -57,11 +403,20 @@ async def startup_event():
             model = CandlestickPredictor(input_size=4, output_size=4, hidden_size=128, num_layers=2)
             model.to(device)
             model.eval()
+            model = maybe_quantize(model)
+            model = compile_model(model)
             print("✅ New model created")
     except Exception as e:
         print(f"❌ Error loading model: {e}")
         model = None
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the micro-batching worker so the event loop can drain cleanly"""
+    if batch_task is not None:
+        batch_task.cancel()
+
 class PredictRequest(BaseModel):
     data: List[List[List[float]]]  # Batch of sequences
     sequence_length: int = 10
@@ -99,42 +454,22 @@ async def predict(request: PredictRequest):
         )
     
     try:
-        batch_predictions = []
-        
+        # Hand every sequence to the micro-batching worker; concurrent
+        # requests accumulate there and run as one batched forward
+        loop = asyncio.get_running_loop()
+        futures = []
         for sequence in request.data:
             if len(sequence) < 5:
                 # If sequence too short, pad with last values
                 while len(sequence) < 5:
                     sequence.append(sequence[-1] if sequence else [0.5, 0.6, 0.4, 0.5])
-            
-            # Convert to tensor and prepare for encoder-decoder model
-            input_tensor = torch.tensor([sequence], dtype=torch.float32).to(device)  # Shape: (1, seq_len, 4)
-            past_lengths = torch.tensor([len(sequence)], dtype=torch.long).to(device)
-            
-            # For overfitted model, predict sequence length proportional to input
-            # Typical training data had future sequences roughly 25-50% of past length
-            # But since model is overfitted, let's use a reasonable future length
-            input_len = len(sequence)
-            
-            # Calculate future length based on training data ratios (model expects this)
-            # The model was trained with variable lengths, so we should predict a realistic length
-            if input_len <= 10:
-                future_len = max(5, input_len // 2)  # At least 5, up to half input length
-            elif input_len <= 25:
-                future_len = input_len // 2  # About half the input length
-            else:
-                future_len = min(25, input_len // 3)  # Reasonable cap at 25 candles
-            
-            future_lengths = torch.tensor([future_len], dtype=torch.long).to(device)
-            
-            # Get prediction from real encoder-decoder model
-            with torch.no_grad():
-                prediction = model(input_tensor, past_lengths, future_lengths)
-                # prediction shape: (1, max_future_len, 4)
-                prediction = prediction.squeeze(0)[:future_len].cpu().numpy().tolist()
-            
-            batch_predictions.append(prediction)
-        
+
+            fut = loop.create_future()
+            await predict_queue.put((sequence, fut))
+            futures.append(fut)
+
+        batch_predictions = list(await asyncio.gather(*futures))
+
         return PredictResponse(
             predictions=batch_predictions,
             status="success",
@@ -146,21 +481,15 @@ async def predict(request: PredictRequest):
         import traceback
         traceback.print_exc()
         # Fallback to demo predictions if model fails
+        trend_factors = np.array([1.01, 1.02, 0.99, 1.01], dtype=np.float32)
         fallback_predictions = []
         for sequence in request.data:
             demo_pred = []
-            last_candle = sequence[-1] if sequence else [0.5, 0.6, 0.4, 0.5]
+            last_candle = np.asarray(sequence[-1] if sequence else [0.5, 0.6, 0.4, 0.5], dtype=np.float32)
             for i in range(5):
-                # Simple trend continuation
-                pred = [
-                    last_candle[0] * (1.01 + i * 0.005),  # Open
-                    last_candle[1] * (1.02 + i * 0.005),  # High
-                    last_candle[2] * (0.99 + i * 0.005),  # Low  
-                    last_candle[3] * (1.01 + i * 0.005)   # Close
-                ]
-                # Ensure values stay in 0-1 range
-                pred = [max(0.0, min(1.0, val)) for val in pred]
-                demo_pred.append(pred)
+                # Simple trend continuation, clipped to the 0-1 range in one op
+                pred = np.clip(last_candle * (trend_factors + i * 0.005), 0.0, 1.0)
+                demo_pred.append(pred.tolist())
                 last_candle = pred
             fallback_predictions.append(demo_pred)
         
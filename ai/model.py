@@ -1,7 +1,23 @@
+import os
+
 import torch
 import torch.nn as nn
 import numpy as np
 
+from typing import Optional
+
+
+def _bf16_autocast_enabled(device_type):
+    """Whether BF16_AUTOCAST=1 is set and the hardware has fast bf16 paths"""
+    if os.environ.get("BF16_AUTOCAST") != "1":
+        return False
+    if device_type == 'cuda':
+        return torch.cuda.is_bf16_supported()
+    try:
+        return torch.cpu._is_avx512_bf16_supported()
+    except AttributeError:
+        return False
+
 class CandlestickLSTM(nn.Module):
     
     """
@@ -54,24 +70,36 @@ class CandlestickLSTM(nn.Module):
         self._initialize_weights()
     
     def _initialize_weights(self):
-        """Initialize model weights using Xavier initialization"""
+        """Initialize model weights using Xavier initialization
+
+        Parameters are grouped by kind first: the Xavier draws stay
+        per-tensor (each gain depends on that tensor's fan-in/fan-out), but
+        all biases are zeroed in one fused _foreach kernel instead of one
+        launch per tensor, which trims cold-start instantiation cost.
+        """
+        weights_2d, weights_1d, biases = [], [], []
         for name, param in self.named_parameters():
             if 'weight' in name:
-                if len(param.shape) >= 2:
-                    nn.init.xavier_uniform_(param)
-                else:
-                    nn.init.uniform_(param, -0.1, 0.1)
+                (weights_2d if param.dim() >= 2 else weights_1d).append(param)
             elif 'bias' in name:
-                nn.init.zeros_(param)
+                biases.append(param)
+
+        with torch.no_grad():
+            for param in weights_2d:
+                nn.init.xavier_uniform_(param)
+            for param in weights_1d:
+                nn.init.uniform_(param, -0.1, 0.1)
+            if biases:
+                torch._foreach_zero_(biases)
     
-    def forward(self, x, target_length=None):
+    def forward(self, x: torch.Tensor, target_length: Optional[int] = None) -> torch.Tensor:
         """
         Forward pass through the model
-        
+
         Args:
             x: Input sequence [batch_size, sequence_length, input_size]
             target_length: Length of prediction sequence (defaults to self.prediction_length)
-        
+
         Returns:
             predictions: [batch_size, target_length, output_size]
         """
@@ -79,61 +107,139 @@ class CandlestickLSTM(nn.Module):
         if target_length is None:
             target_length = self.prediction_length
         
-        # Encode input sequence
-        encoder_outputs, (hidden, cell) = self.encoder_lstm(x)
-        
-        # Initialize decoder
-        predictions = []
-        
+        # Encode input sequence (per-step encoder outputs are unused, so only
+        # keep the final states rather than holding the [B, S, H] tensor live)
+        _, (hidden, cell) = self.encoder_lstm(x)
+
+        # Preallocate the output once instead of appending per-step tensors to
+        # a list and paying a torch.cat allocation plus copy at the end
+        out = torch.empty(batch_size, target_length, self.output_size, device=x.device, dtype=x.dtype)
+
         # Use last input as initial decoder input
         decoder_input = x[:, -1, :].unsqueeze(1)  # [batch_size, 1, input_size]
-        
-        # Generate predictions step by step
-        for _ in range(target_length):
+
+        # Generate predictions step by step. The projection cannot be
+        # deferred and batched over all T steps: each step's projected
+        # (sigmoid'd) output is the decoder input of the next step, so it
+        # must be materialized inside the loop. Projecting the squeezed
+        # [batch_size, hidden] tensor at least keeps every Linear a plain
+        # 2-D GEMM instead of a batched 3-D matmul over a singleton dim.
+        for t in range(target_length):
             # Decoder step
             decoder_output, (hidden, cell) = self.decoder_lstm(decoder_input, (hidden, cell))
-            
+
             # Project to output size
-            prediction = self.output_projection(decoder_output)  # [batch_size, 1, output_size]
-            predictions.append(prediction)
-            
+            prediction = self.output_projection(decoder_output.squeeze(1))  # [batch_size, output_size]
+            out[:, t] = prediction
+
             # Use prediction as next input
-            decoder_input = prediction
-        
-        # Concatenate all predictions
-        predictions = torch.cat(predictions, dim=1)  # [batch_size, target_length, output_size]
-        
-        return predictions
-    
+            decoder_input = prediction.unsqueeze(1)
+
+        return out  # [batch_size, target_length, output_size]
+
+    def _inference_model(self):
+        """
+        Script, freeze and cache an inference copy of this model
+
+        Scripting compiles the autoregressive decoder loop, removing the
+        per-step Python dispatch between decoder_lstm and output_projection;
+        freezing plus optimize_for_inference folds the eval-mode Dropout away
+        and lets the fuser collapse the Linear/ReLU/Sigmoid projection.
+
+        Built lazily on the first predict_single call (i.e. after weights
+        are loaded); falls back to the eager module if scripting fails.
+        """
+        if self.__dict__.get('_scripted') is None:
+            try:
+                frozen = torch.jit.freeze(torch.jit.script(self).eval())
+                scripted = torch.jit.optimize_for_inference(frozen)
+            except Exception:
+                scripted = self
+            # Bypass nn.Module attribute registration: the scripted copy must
+            # not become a submodule, or its weights would leak into state_dict
+            self.__dict__['_scripted'] = scripted
+        return self.__dict__['_scripted']
+
     def predict_single(self, x, target_length=None):
         """
         Predict for a single sequence (inference mode)
-        
+
         Args:
             x: Input sequence [sequence_length, input_size]
             target_length: Length of prediction
-            
+
         Returns:
             predictions: [target_length, output_size]
         """
         self.eval()
-        with torch.no_grad():
+        # inference_mode is cheaper than no_grad: no version counter/view tracking
+        with torch.inference_mode():
             # Add batch dimension
             x = x.unsqueeze(0)  # [1, sequence_length, input_size]
-            
-            # Get prediction
-            pred = self.forward(x, target_length)
-            
+
+            if _bf16_autocast_enabled(x.device.type):
+                # bf16 GEMMs with fp32 master weights; the frozen scripted
+                # copy prepacks fp32 weights, so run the eager module here
+                with torch.autocast(device_type=x.device.type, dtype=torch.bfloat16):
+                    pred = self.forward(x, target_length).float()
+            else:
+                # Get prediction from the cached scripted model
+                pred = self._inference_model()(x, target_length)
+
             # Remove batch dimension
             pred = pred.squeeze(0)  # [target_length, output_size]
-            
+
             return pred
 
+class CausalEncoderLayer(nn.TransformerEncoderLayer):
+    """
+    Encoder layer whose self-attention is always causal, computed with
+    F.scaled_dot_product_attention
+
+    The fused SDPA kernel applies the causal constraint internally, so no
+    (seq+T)^2 mask tensor is materialized and the matmul/mask-add/softmax/
+    matmul chain collapses into one kernel. Uses the same in_proj/out_proj
+    parameters as nn.MultiheadAttention, so checkpoints are unaffected.
+    """
+
+    def forward(self, src, src_mask=None, src_key_padding_mask=None, is_causal=False):
+        # Explicit block structure: the stock forward can take the C++
+        # "sparsity fast path" when no mask is passed, which would skip the
+        # causal _sa_block below and attend to future positions
+        x = src
+        if self.norm_first:
+            x = x + self._sa_block(self.norm1(x), src_mask, src_key_padding_mask)
+            x = x + self._ff_block(self.norm2(x))
+        else:
+            x = self.norm1(x + self._sa_block(x, src_mask, src_key_padding_mask))
+            x = self.norm2(x + self._ff_block(x))
+        return x
+
+    def _sa_block(self, x, attn_mask, key_padding_mask, is_causal=False):
+        attn = self.self_attn
+        batch_size, seq_len, embed_dim = x.shape
+        head_dim = embed_dim // attn.num_heads
+
+        qkv = nn.functional.linear(x, attn.in_proj_weight, attn.in_proj_bias)
+        q, k, v = qkv.chunk(3, dim=-1)
+        q = q.view(batch_size, seq_len, attn.num_heads, head_dim).transpose(1, 2)
+        k = k.view(batch_size, seq_len, attn.num_heads, head_dim).transpose(1, 2)
+        v = v.view(batch_size, seq_len, attn.num_heads, head_dim).transpose(1, 2)
+
+        out = nn.functional.scaled_dot_product_attention(
+            q, k, v,
+            dropout_p=attn.dropout if self.training else 0.0,
+            is_causal=True,
+        )
+        out = out.transpose(1, 2).reshape(batch_size, seq_len, embed_dim)
+        return self.dropout1(attn.out_proj(out))
+
+
 class CandlestickTransformer(nn.Module):
     """
     Alternative Transformer model for candlestick prediction
     """
-    
+
     def __init__(self, input_size=4, d_model=128, nhead=8, num_layers=6, output_size=4, sequence_length=50, prediction_length=25):
         super(CandlestickTransformer, self).__init__()
         
@@ -149,8 +255,8 @@ class CandlestickTransformer(nn.Module):
         # Positional encoding
         self.pos_encoder = PositionalEncoding(d_model, sequence_length + prediction_length)
         
-        # Transformer
-        encoder_layer = nn.TransformerEncoderLayer(
+        # Transformer (causal attention is fused into the layer itself)
+        encoder_layer = CausalEncoderLayer(
             d_model=d_model,
             nhead=nhead,
             dim_feedforward=d_model * 4,
@@ -186,22 +292,15 @@ class CandlestickTransformer(nn.Module):
         # Concatenate input and prediction tokens
         full_sequence = torch.cat([x, pred_tokens], dim=1)
         
-        # Create attention mask to prevent looking at future predictions
-        mask = self._generate_square_subsequent_mask(seq_len + target_length, x.device)
-        
-        # Apply transformer
-        output = self.transformer(full_sequence, mask=mask)
+        # Apply transformer; the layers mask future positions internally, so
+        # no explicit (seq+T)^2 mask tensor is built here
+        output = self.transformer(full_sequence)
         
         # Extract prediction part and project to output size
         predictions = output[:, seq_len:, :]
         predictions = self.output_projection(predictions)
         
         return predictions
-    
-    def _generate_square_subsequent_mask(self, sz, device):
-        """Generate mask for transformer"""
-        mask = torch.triu(torch.ones(sz, sz, device=device) * float('-inf'), diagonal=1)
-        return mask
 
 class PositionalEncoding(nn.Module):
     """Positional encoding for transformer"""
@@ -215,12 +314,22 @@ class PositionalEncoding(nn.Module):
         
         pe[:, 0::2] = torch.sin(position * div_term)
         pe[:, 1::2] = torch.cos(position * div_term)
-        pe = pe.unsqueeze(0).transpose(0, 1)
-        
-        self.register_buffer('pe', pe)
-    
+
+        # Stored as (1, max_len, d_model) so forward is a contiguous slice
+        # plus one broadcast add, with no per-call transpose copy. Not
+        # persistent: the table is deterministic and recomputed in __init__,
+        # so it has no business living in checkpoints
+        self.register_buffer('pe', pe.unsqueeze(0), persistent=False)
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # Checkpoints saved before the layout change (or while the buffer
+        # was persistent) carry a pos_encoder.pe of shape
+        # (max_len, 1, d_model); drop it so they keep loading cleanly
+        state_dict.pop(prefix + 'pe', None)
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
     def forward(self, x):
-        return x + self.pe[:x.size(1), :].transpose(0, 1)
+        return x + self.pe[:, :x.size(1)]
 
 def create_model(model_type="lstm", **kwargs):
     """
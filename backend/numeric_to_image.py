@@ -1,5 +1,6 @@
 from typing import List
 
+import numpy as np
 from PIL import Image, ImageDraw
 
 
@@ -92,10 +93,11 @@ def create_candlestick_chart_advanced(numeric: List[List[float]], width: int = 3
     num_candles = len(numeric)
     candle_width = chart_width // num_candles
     
-    # Find min and max values for better scaling
-    all_values = [val for candle in numeric for val in candle]
-    min_val = min(all_values)
-    max_val = max(all_values)
+    # Find min and max values for better scaling (C reduction, not a
+    # flattening loop)
+    values = np.asarray(numeric, dtype=float)
+    min_val = float(values.min())
+    max_val = float(values.max())
     value_range = max_val - min_val if max_val > min_val else 1
     
     for i, (o, h_, l, c) in enumerate(numeric):
@@ -3,84 +3,114 @@ import os
 import cv2
 import numpy as np
 import pickle
+from concurrent.futures import ProcessPoolExecutor
 
 DATASET_DIR = "dataset"  # folder with sample_X/input.png and label.png
 OUTPUT_DIR = "numeric_dataset"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def extract_candles(image_path):
-    img = cv2.imread(image_path)
+# Hue acceptance table for candle colors: red wraps around (0-10 and
+# 170-180), green sits at 40-90. One LUT pass over the hue plane replaces
+# three inRange passes and two bitwise_or merges, producing the same mask.
+HUE_LUT = np.zeros(256, np.uint8)
+HUE_LUT[0:11] = 255    # red (low wrap)
+HUE_LUT[40:91] = 255   # green
+HUE_LUT[170:181] = 255  # red (high wrap)
+
+def extract_candles(img):
+    # Takes the already-decoded BGR array: the driver needs the image shape
+    # too, so decoding happens once per file instead of per use
     if img is None:
         return []
 
     hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
     h, w, _ = img.shape
 
-    # Thresholds for green/red candles
-    green_mask = cv2.inRange(hsv, (40, 50, 50), (90, 255, 255))
-    red_mask1 = cv2.inRange(hsv, (0, 50, 50), (10, 255, 255))
-    red_mask2 = cv2.inRange(hsv, (170, 50, 50), (180, 255, 255))
-    red_mask = cv2.bitwise_or(red_mask1, red_mask2)
-
-    mask = cv2.bitwise_or(green_mask, red_mask)
+    # Thresholds for green/red candles: saturation/value gate in one
+    # inRange, hue ranges via the lookup table
+    sv_mask = cv2.inRange(hsv, (0, 50, 50), (180, 255, 255))
+    hue_mask = cv2.LUT(hsv[..., 0], HUE_LUT)
+    mask = cv2.bitwise_and(sv_mask, hue_mask)
     cols_with_candle = np.where(np.any(mask > 0, axis=0))[0]
 
     if len(cols_with_candle) == 0:
         return []
 
-    candles = []
-    start = cols_with_candle[0]
-    for i in range(1, len(cols_with_candle)):
-        if cols_with_candle[i] > cols_with_candle[i-1] + 1:
-            end = cols_with_candle[i-1]
-            candle_slice = mask[:, start:end+1]
-
-            rows = np.where(np.any(candle_slice > 0, axis=1))[0]
-            if len(rows) == 0:
-                start = cols_with_candle[i]
-                continue
-
-            low = rows.max() / h
-            high = rows.min() / h
-            mid = (end-start)//2
-            left = candle_slice[:, :mid]
-            right = candle_slice[:, mid:]
-            o = np.mean(np.where(np.any(left>0, axis=1))[0])/h if np.any(left>0) else high
-            c = np.mean(np.where(np.any(right>0, axis=1))[0])/h if np.any(right>0) else high
-
-            candles.append([o, high, low, c])
-            start = cols_with_candle[i]
-
-    return candles
-
-# --- Process all samples ---
-all_data = []
-
-for sample_folder in sorted(os.listdir(DATASET_DIR)):
-    folder_path = os.path.join(DATASET_DIR, sample_folder)
-    if not os.path.isdir(folder_path):
-        continue
-
+    # Segment consecutive column runs into candles in one vectorized pass:
+    # a gap in the sorted column indices marks a candle boundary. As in the
+    # original loop, the trailing run has no gap after it and is not
+    # emitted, so only the runs before each break become candles.
+    breaks = np.where(np.diff(cols_with_candle) > 1)[0]
+    starts = np.concatenate(([cols_with_candle[0]], cols_with_candle[breaks + 1]))[:-1]
+    ends = cols_with_candle[breaks]
+    mids = (ends - starts) // 2
+
+    # Per-row pixel counts for each candle and for its left/right half, all
+    # derived from one column-prefix-sum pass over the mask instead of
+    # re-slicing and re-scanning mask[:, start:end+1] per candle
+    prefix = np.zeros((h, w + 1), dtype=np.int32)
+    np.cumsum(mask > 0, axis=1, out=prefix[:, 1:])
+    seg_counts = prefix[:, ends + 1] - prefix[:, starts]
+    left_counts = prefix[:, starts + mids] - prefix[:, starts]
+    right_counts = prefix[:, ends + 1] - prefix[:, starts + mids]
+    row_has = seg_counts > 0
+
+    # First/last occupied row of each run (rows.min()/rows.max() before)
+    high = row_has.argmax(axis=0) / h
+    low = ((h - 1) - row_has[::-1].argmax(axis=0)) / h
+
+    # Open/close: mean occupied row of the left/right half; an empty left
+    # half (mid == 0) falls back to the high, exactly as the loop did
+    row_idx = np.arange(h, dtype=np.float64)[:, None]
+    left_has = left_counts > 0
+    right_has = right_counts > 0
+    left_n = left_has.sum(axis=0)
+    right_n = right_has.sum(axis=0)
+    with np.errstate(invalid='ignore'):
+        o = np.where(left_n > 0, (row_idx * left_has).sum(axis=0) / left_n / h, high)
+        c = np.where(right_n > 0, (row_idx * right_has).sum(axis=0) / right_n / h, high)
+
+    return np.stack([o, high, low, c], axis=1).tolist()
+
+def process_sample(folder_path):
+    """Extract one sample folder's past/future candles, or None to skip"""
     input_path = os.path.join(folder_path, "input.png")
     label_path = os.path.join(folder_path, "label.png")
 
-    past_candles = extract_candles(input_path)
-    future_candles = extract_candles(label_path)
+    # One decode per file; shapes come from the same arrays (the old code
+    # re-read each PNG twice more just to record its size)
+    past_img = cv2.imread(input_path)
+    future_img = cv2.imread(label_path)
+
+    past_candles = extract_candles(past_img)
+    future_candles = extract_candles(future_img)
 
     if len(past_candles) == 0 or len(future_candles) == 0:
-        continue
+        return None
 
-    sample_data = {
+    return {
         "past": past_candles,
         "future": future_candles,
-        "input_size": (input_path and cv2.imread(input_path).shape[1], cv2.imread(input_path).shape[0]),
-        "output_size": (label_path and cv2.imread(label_path).shape[1], cv2.imread(label_path).shape[0])
+        "input_size": (past_img.shape[1], past_img.shape[0]),
+        "output_size": (future_img.shape[1], future_img.shape[0])
     }
-    all_data.append(sample_data)
-
-# --- Save dataset ---
-output_file = os.path.join(OUTPUT_DIR, "all_samples_numeric.pkl")
-with open(output_file, "wb") as f:
-    pickle.dump(all_data, f)
 
-print(f"Extracted {len(all_data)} samples into {output_file}")
+# --- Process all samples ---
+if __name__ == "__main__":
+    folders = [os.path.join(DATASET_DIR, f)
+               for f in sorted(os.listdir(DATASET_DIR))
+               if os.path.isdir(os.path.join(DATASET_DIR, f))]
+
+    # Samples are independent and pure CPU (decode + mask + reductions), so
+    # extraction fans out across cores; chunksize keeps IPC overhead down.
+    # Pickle writing stays in the driver.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        results = ex.map(process_sample, folders, chunksize=16)
+        all_data = [sample for sample in results if sample is not None]
+
+    # --- Save dataset ---
+    output_file = os.path.join(OUTPUT_DIR, "all_samples_numeric.pkl")
+    with open(output_file, "wb") as f:
+        pickle.dump(all_data, f)
+
+    print(f"Extracted {len(all_data)} samples into {output_file}")